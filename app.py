@@ -1,33 +1,36 @@
 import streamlit as st
 import pandas as pd
-import io
 import plotly.graph_objects as go
-import re
+
+from csv_io import canonical_column, load_csv, parse_ohlc_columns, to_parquet_bytes
 
 st.set_page_config(page_title="OHLC CSV Viewer", layout="wide")
 st.title("OHLC CSV Viewer & Candlestick Chart")
 
-def read_csv_auto_sep(uploaded_file):
-    # Try comma, then tab
-    for sep in [",", "\t"]:
-        uploaded_file.seek(0)
-        try:
-            df = pd.read_csv(uploaded_file, sep=sep)
-            if df.shape[1] < 2:
-                continue
-            return df
-        except Exception:
-            continue
-    raise ValueError("Could not read file as CSV (comma or tab separated).")
+def downsample_ohlc(df, max_bars=5000):
+    # Merge runs of consecutive bars so at most max_bars candles are sent to the browser;
+    # each merged candle keeps its bucket's true high and low
+    step = -(-len(df) // max_bars)
+    if step <= 1:
+        return df, 1
+    buckets = df.groupby(pd.RangeIndex(len(df)) // step)
+    merged = buckets.agg({
+        'DateTime': 'first',
+        'Open': 'first',
+        'High': 'max',
+        'Low': 'min',
+        'Close': 'last',
+    })
+    return merged, step
 
-uploaded = st.file_uploader("Upload CSV file (comma or tab separated)", type=["csv", "txt", "tsv"])
+uploaded = st.file_uploader("Upload CSV file (comma, tab, semicolon or pipe separated)", type=["csv", "txt", "tsv"])
 
 if uploaded is None:
     st.info("Upload a CSV to begin.")
     st.stop()
 
 try:
-    df = read_csv_auto_sep(uploaded)
+    df, upload_key = load_csv(uploaded)
 except Exception as e:
     st.error(f"Could not read CSV: {e}")
     st.stop()
@@ -39,33 +42,30 @@ st.write("Columns detected:", df.columns.tolist())  # Show columns for debugging
 # Try to auto-detect and rename columns for candlestick
 col_map = {}
 for col in df.columns:
-    col_clean = col.strip().lower()
-    if 'date' in col_clean:
-        col_map[col] = 'DateTime'
-    elif re.match(r'open', col_clean):
-        col_map[col] = 'Open'
-    elif re.match(r'high', col_clean):
-        col_map[col] = 'High'
-    elif re.match(r'low', col_clean):
-        col_map[col] = 'Low'
-    elif re.match(r'close', col_clean):
-        col_map[col] = 'Close'
+    name = canonical_column(col)
+    if name:
+        col_map[col] = name
 
-df = df.rename(columns=col_map)
+# Relabel in place; rename() would copy every column on pandas < 3
+df.columns = [col_map.get(col, col) for col in df.columns]
 
 st.success(f"Loaded {uploaded.name} — {df.shape[0]:,} rows × {df.shape[1]:,} columns")
-st.dataframe(df, use_container_width=True)
+# Only the preview rows are serialized to Arrow and sent to the browser on each rerun
+st.dataframe(df.head(1000), use_container_width=True)
+if len(df) > 1000:
+    st.caption(f"Showing the first 1,000 of {len(df):,} rows.")
 
 # Candlestick chart
 ohlc_cols = ['DateTime', 'Open', 'High', 'Low', 'Close']
 if all(col in df.columns for col in ohlc_cols):
-    df['DateTime'] = pd.to_datetime(df['DateTime'], errors='coerce')
+    df = parse_ohlc_columns(df, upload_key)
+    df_plot, step = downsample_ohlc(df)
     fig = go.Figure(data=[go.Candlestick(
-        x=df['DateTime'],
-        open=df['Open'],
-        high=df['High'],
-        low=df['Low'],
-        close=df['Close'],
+        x=df_plot['DateTime'],
+        open=df_plot['Open'],
+        high=df_plot['High'],
+        low=df_plot['Low'],
+        close=df_plot['Close'],
         increasing_line_color='green',
         decreasing_line_color='red'
     )])
@@ -76,6 +76,8 @@ if all(col in df.columns for col in ohlc_cols):
         xaxis_rangeslider_visible=False
     )
     st.plotly_chart(fig, use_container_width=True)
+    if step > 1:
+        st.caption(f"Chart shows {len(df_plot):,} candles, each merging {step} consecutive bars.")
 else:
     st.info(f"Candlestick chart not shown: Data must have columns {ohlc_cols}. Your columns: {df.columns.tolist()}")
 
@@ -83,19 +85,26 @@ else:
 with st.expander("Summary"):
     st.write("Dtypes")
     st.write(df.dtypes.astype(str))
+    # One describe() pass; the numeric view is sliced out of it
+    desc_all = df.describe(include="all")
+    num_cols = df.select_dtypes(include=["number", "datetime", "datetimetz"]).columns
     st.write("Describe (numeric)")
-    st.write(df.describe())
+    if len(num_cols):
+        # Drop the object-only rows by name; dropna() would also lose real rows such
+        # as std on a one-row frame
+        desc_num = desc_all.loc[:, num_cols].drop(index=["unique", "top", "freq"], errors="ignore")
+        st.write(desc_num.infer_objects())
+    else:
+        st.write(desc_all)
     st.write("Describe (all columns)")
-    st.write(df.describe(include="all").T)
+    st.write(desc_all.T)
 
 # Downloads
 with st.expander("Downloads"):
-    pq_buf = io.BytesIO()
     try:
-        df.to_parquet(pq_buf, index=False)
         st.download_button(
             "Download as Parquet (.parquet)",
-            data=pq_buf.getvalue(),
+            data=to_parquet_bytes(df),
             file_name="data.parquet",
             mime="application/octet-stream",
         )
@@ -108,3 +117,4 @@ with st.expander("Downloads"):
         file_name="data_clean.csv",
         mime="text/csv",
     )
+
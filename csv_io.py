@@ -0,0 +1,261 @@
+"""CSV loading and OHLC typing for the Streamlit pages."""
+import streamlit as st
+import pandas as pd
+import numpy as np
+import io
+import hashlib
+import csv
+import warnings
+import charset_normalizer
+from pandas._libs.tslibs.parsing import guess_datetime_format
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Lowercased header prefixes and the canonical OHLC names they map to
+_OHLC_PREFIXES = {"open": "Open", "high": "High", "low": "Low", "close": "Close"}
+_PRICE_COLUMNS = tuple(_OHLC_PREFIXES.values())
+# Signs that ',' groups digits: a '.' anywhere, or more than one comma group (1,234,567)
+_GROUPING_EVIDENCE = r"\.|,.*,"
+# Year-first layouts are unambiguous, so Arrow can parse them while reading;
+# day/month-first dates are left to parse_datetime's trial parse
+_TIMESTAMP_FORMATS = [
+    "%Y.%m.%d %H:%M:%S",
+    "%Y.%m.%d %H:%M",
+    "%Y.%m.%d",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d %H:%M",
+    "%Y/%m/%d",
+]
+
+def canonical_column(col):
+    # Plain string probes instead of a regex per header
+    key = col.strip().lower()
+    if 'date' in key:
+        return 'DateTime'
+    return next((name for prefix, name in _OHLC_PREFIXES.items() if key.startswith(prefix)), None)
+
+def detect_encoding(content, sample_size=65536):
+    # BOM first, otherwise let charset-normalizer guess from a sample
+    if content[:3] == b"\xef\xbb\xbf":
+        return "utf-8-sig"
+    if content[:2] in (b"\xff\xfe", b"\xfe\xff"):
+        return "utf-16"
+    sample = bytes(content[:sample_size])
+    if len(content) > sample_size and b"\n" in sample:
+        # End on a line boundary so the cut never splits a multi-byte character
+        sample = sample[:sample.rindex(b"\n") + 1]
+    best = charset_normalizer.from_bytes(sample).best()
+    if best is None or best.encoding == "ascii":
+        return "utf-8"
+    return best.encoding
+
+def read_csv_sep(content, sep, enc="utf-8", column_types=None):
+    # Arrow's multithreaded C++ reader first, pandas only if Arrow rejects the file
+    if pa is not None:
+        try:
+            table = pacsv.read_csv(
+                pa.BufferReader(content),
+                read_options=pacsv.ReadOptions(
+                    block_size=1 << 20,
+                    use_threads=True,
+                    # Arrow decodes UTF-8 natively (BOM included); anything else is transcoded
+                    encoding="utf8" if enc in ("utf-8", "utf-8-sig") else enc,
+                ),
+                parse_options=pacsv.ParseOptions(delimiter=sep),
+                convert_options=pacsv.ConvertOptions(
+                    column_types=column_types or {},
+                    timestamp_parsers=[pacsv.ISO8601, *_TIMESTAMP_FORMATS],
+                ),
+            )
+            return table.to_pandas(self_destruct=True, date_as_object=False)
+        except pa.ArrowInvalid:
+            if column_types:
+                # e.g. prices with thousands separators; let parse_price clean them up
+                return read_csv_sep(content, sep, enc)
+    return pd.read_csv(
+        io.BytesIO(content),
+        sep=sep,
+        engine="c",
+        encoding=enc,
+        on_bad_lines="skip",
+        low_memory=False,
+    )
+
+def sniff_sep(content, enc="utf-8", sample_size=16384):
+    # Pick the delimiter whose per-line count is stable over the first data lines
+    head = bytes(content[:sample_size]).decode(enc, errors="replace")
+    lines = head.splitlines()
+    if len(content) > sample_size:
+        lines = lines[:-1]  # last line of the sample may be cut short
+    if not lines:
+        return ","
+    rows = lines[1:11] or lines[:1]
+    # A candidate that also splits the header into the same number of fields wins
+    # over one that is merely stable on data rows (e.g. decimal commas in a ';' file)
+    best_sep, best_score = None, (False, 0)
+    for sep in [",", "\t", ";", "|"]:
+        counts = [ln.count(sep) for ln in rows]
+        if counts[0] == 0 or any(c != counts[0] for c in counts):
+            continue
+        score = (lines[0].count(sep) == counts[0], counts[0])
+        if score > best_score:
+            best_sep, best_score = sep, score
+    if best_sep is None:
+        # Ragged sample: fall back to whichever candidate dominates the header
+        best_sep = max([",", "\t", ";", "|"], key=lines[0].count)
+    return best_sep
+
+def price_column_types(content, sep, enc="utf-8", sample_size=16384):
+    # Read the header up front so Arrow parses Open/High/Low/Close straight to float32
+    if pa is None:
+        return None
+    head = bytes(content[:sample_size]).decode(enc, errors="replace")
+    header = next(csv.reader(io.StringIO(head), delimiter=sep), [])
+    return {
+        col: pa.float32()
+        for col in header
+        if canonical_column(col) in _PRICE_COLUMNS
+    }
+
+# Process-wide and shared by every session, so keep only a few recent uploads
+@st.cache_data(show_spinner=False, max_entries=4, ttl=3600)
+def read_csv_cached(_content, key):
+    # Streamlit does not hash underscore-prefixed args; `key` alone identifies the upload
+    enc = detect_encoding(_content)
+    sep = sniff_sep(_content, enc)
+    df = read_csv_sep(_content, sep, enc, price_column_types(_content, sep, enc))
+    if df.shape[1] < 2:
+        raise ValueError("Could not read file as CSV (comma, tab, semicolon or pipe separated).")
+    # Narrow integer columns (e.g. Volume) to the smallest width that holds them;
+    # prices are left for parse_price, which makes them float32
+    for i, col in enumerate(df.columns):
+        if canonical_column(str(col)) in _PRICE_COLUMNS:
+            continue
+        if pd.api.types.is_integer_dtype(df.dtypes.iloc[i]):
+            df.isetitem(i, pd.to_numeric(df.iloc[:, i], downcast="integer"))
+    # parse_price needs the delimiter to tell decimal commas from grouping commas
+    df.attrs["sep"] = sep
+    return df
+
+def load_csv(uploaded_file):
+    # Returns the parsed frame plus the upload key; the buffer is a zero-copy view
+    # and only the sniffing samples are copied out of it
+    content = uploaded_file.getbuffer()
+    key = hashlib.blake2b(content, digest_size=16).hexdigest()
+    return read_csv_cached(content, key), key
+
+def parse_datetime(s, sample_size=500):
+    # Guess one format from the first value so pandas parses vectorized instead of per element
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    non_null = s.dropna()
+    if non_null.empty:
+        return pd.to_datetime(s, errors="coerce")
+    uniq = non_null.unique()
+    first = str(uniq[0])
+    guesses = []
+    for dayfirst in (False, True):
+        # pandas warns when a guess disagrees with the dayfirst hint (e.g. %Y%m%d
+        # with dayfirst=True); both orders are tried on purpose, so stay quiet
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            guess = guess_datetime_format(first, dayfirst=dayfirst)
+        if guess is not None and guess not in guesses:
+            guesses.append(guess)
+    # Trial-parse evenly spaced distinct values with each guess, so a sorted intraday
+    # file is judged on many dates rather than on its first day; on a tie, widen to
+    # every distinct value. Only a column where every day is <= 12 stays tied, and
+    # then the month-first guess is kept. The winner must cover at least 80%.
+    fmt, fmt_ok = None, 0.0
+    if guesses:
+        spread = uniq[np.linspace(0, len(uniq) - 1, min(sample_size, len(uniq))).astype(int)]
+        samples = [spread] if len(uniq) <= sample_size else [spread, uniq]
+        for sample in samples:
+            scores = [pd.to_datetime(sample, format=g, errors="coerce").notna().mean() for g in guesses]
+            if len(set(scores)) == len(scores):
+                break
+        fmt_ok = max(scores)
+        fmt = guesses[scores.index(fmt_ok)]
+    if fmt_ok < 0.8:
+        fmt = None
+    # Repeated timestamps (e.g. several symbols per bar) are parsed once each
+    if len(uniq) < len(non_null):
+        parsed = pd.to_datetime(uniq, format=fmt, errors="coerce")
+        return s.map(pd.Series(parsed, index=uniq))
+    return pd.to_datetime(s, format=fmt, errors="coerce")
+
+def comma_is_decimal(columns, sep):
+    # Decided once per file from all price columns, so the values in one row never
+    # disagree. In ',' files a comma can only group digits; elsewhere (typically ';')
+    # it is the decimal mark unless a column shows clear grouping evidence
+    if sep == ",":
+        return False
+    for s in columns:
+        if pd.api.types.is_numeric_dtype(s):
+            continue
+        if pa is not None:
+            try:
+                found = pc.any(pc.match_substring_regex(pa.array(s, from_pandas=True), _GROUPING_EVIDENCE))
+                if found.as_py():
+                    return False
+                continue
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                pass
+        if s.str.contains(_GROUPING_EVIDENCE, regex=True).fillna(False).astype(bool).any():
+            return False
+    return True
+
+def parse_price(s, decimal_comma=False):
+    # Drop stray spaces and grouping commas (or turn decimal commas into '.'), then coerce to float32
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype("float32")
+    if pa is not None:
+        # Arrow's string kernels clean and cast in C++; any unparsable value drops
+        # back to the pandas path below, which coerces it to NaN
+        try:
+            arr = pa.array(s, from_pandas=True)
+            if decimal_comma:
+                arr = pc.replace_substring(pc.replace_substring(arr, " ", ""), ",", ".")
+            else:
+                # The common case strips commas and spaces in a single regex pass
+                arr = pc.replace_substring_regex(arr, "[, ]", "")
+            arr = pc.cast(arr, pa.float32())
+            return pd.Series(arr.to_numpy(zero_copy_only=False), index=s.index, name=s.name)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            pass
+    comma = "." if decimal_comma else None
+    # str.translate handles both characters in one pass either way
+    cleaned = s.str.translate({ord(","): comma, ord(" "): None})
+    # downcast="float" keeps float64 when float32 would round, so cast explicitly
+    return pd.to_numeric(cleaned, errors="coerce").astype("float32")
+
+# Same limits as read_csv_cached; both hold one frame per upload
+@st.cache_data(show_spinner=False, max_entries=4, ttl=3600)
+def parse_ohlc_columns(_df, key):
+    # Typed OHLC frame, cached on the upload key so reruns skip the date/price parsing.
+    # _df is this rerun's own copy from read_csv_cached, so it is converted in place.
+    df = _df
+    df['DateTime'] = parse_datetime(df['DateTime'])
+    decimal_comma = comma_is_decimal([df[col] for col in _PRICE_COLUMNS], df.attrs.get("sep", ","))
+    for col in _PRICE_COLUMNS:
+        df[col] = parse_price(df[col], decimal_comma)
+    return df
+
+def to_parquet_bytes(df):
+    if pa is None:
+        raise ImportError("pyarrow is required for Parquet export")
+    # Write straight into an Arrow buffer; ZSTD + dictionary pages keep the payload small
+    pq_buf = pa.BufferOutputStream()
+    pq.write_table(
+        pa.Table.from_pandas(df, preserve_index=False),
+        pq_buf,
+        compression="zstd",
+        use_dictionary=True,
+    )
+    return pq_buf.getvalue().to_pybytes()